@@ -54,9 +54,10 @@ def extract_approach_metadata(plan_view_box, plate, drawings, debug=False):
         # the final point of the last bezier curve.
         curve_start = path["items"][0][1]
         curve_end = path["items"][-1][4]
-        curve_distance = curve_start.distance_to(curve_end)
-        # Filter out any arcs that are too small or too large.
-        if curve_distance < 10 or curve_distance > 50:
+        # Filter out any arcs that are too small or too large, comparing the
+        # squared length so we don't need a sqrt for every path.
+        curve_distance_squared = squared_distance(curve_start, curve_end)
+        if curve_distance_squared < 10**2 or curve_distance_squared > 50**2:
             continue
         arc_diameter_lines.append((curve_start, curve_end))
 
@@ -80,7 +81,10 @@ def extract_approach_metadata(plan_view_box, plate, drawings, debug=False):
         # then we consider it to be a race-track.
         for curve_loc in bezier_curve_locations:
             # Ignore the curve locations that are on this arc line itself.
-            if curve_loc.distance_to(line[0]) < 2 or curve_loc.distance_to(line[1]) < 2:
+            if (
+                squared_distance(curve_loc, line[0]) < 2**2
+                or squared_distance(curve_loc, line[1]) < 2**2
+            ):
                 continue
             # Calculate distance between perp lines and the point.
             curve_loc_array = np.array([curve_loc.x, curve_loc.y])
@@ -123,15 +127,15 @@ def extract_approach_metadata(plan_view_box, plate, drawings, debug=False):
 
         for item in path["items"]:
             line = (item[1], item[2])
-            line_distance = item[1].distance_to(item[2])
+            line_distance_squared = squared_distance(item[1], item[2])
 
             # Barb triangle base between around 4.8
-            if abs(line_distance - 4.8) < 0.6:
+            if (4.8 - 0.6) ** 2 < line_distance_squared < (4.8 + 0.6) ** 2:
                 base_candidates.append(line)
                 if debug:
                     arc_diameter_lines.append(line)
             # Barb triangle hypotenuse around 9
-            if abs(line_distance - 9) < 1:
+            if (9 - 1) ** 2 < line_distance_squared < (9 + 1) ** 2:
                 p1 = (round(item[1].x, 0), round(item[1].y, 0))
                 p2 = (round(item[2].x, 0), round(item[2].y, 0))
 
@@ -256,6 +260,14 @@ def get_i_beam_from_line(line):
     return perp_line_1, perp_line_2
 
 
+def squared_distance(point1, point2):
+    """Squared distance between two `pymupdf.Point`s, cheaper than
+    `Point.distance_to` when we only compare against a threshold."""
+    dx = point1.x - point2.x
+    dy = point1.y - point2.y
+    return dx * dx + dy * dy
+
+
 def line_distance_to_point(line, point):
     """Calculate perpendicular from a tuple of points defining `line` and `point`"""
     return np.linalg.norm(
@@ -1,22 +1,11 @@
 import pymupdf
 import numpy as np
 import skimage
+from scipy import ndimage
 
 from typing import Optional
 
 
-def line_segment_as_rect_from_points(point1, point2):
-    """
-    Creates a pymupdf.Rect instance from point1 and point2 representing a line
-    segment.
-    """
-    x0, y0 = round(point1.x, 1), round(point1.y, 1)
-    x1, y1 = round(point2.x, 1), round(point2.y, 1)
-    rect = pymupdf.Rect(x0, y0, x1, y1)
-    rect.normalize()
-    return rect
-
-
 def round_to_nearest(x, nearest):
     """Rounds `x`, a float to the `nearest` number"""
     x = int(round(x, 0))
@@ -44,6 +33,35 @@ def make_rectangle_from_quad(quad: pymupdf.Quad) -> Optional[pymupdf.Rect]:
     return quad.rect
 
 
+def rasterize_lines(lines, width, height):
+    """
+    Draws the whole-point `(x0, y0, x1, y1)` line segments into a `height` x
+    `width` uint8 image that is 1 in open space and 0 wherever a 1pt wide line
+    covers a pixel.
+
+    Each line covers the pixels either side of it along its short axis and up
+    to its end along the long axis. For exactly horizontal and vertical lines
+    these are the same pixels a 72 dpi render of the stroke touches. Lines that
+    are slightly slanted are approximated by filling the whole band between
+    their end points rather than drawing the diagonal.
+
+    Parts of lines that fall off the page are clipped away.
+    """
+    image = np.ones((height, width), dtype=np.uint8)
+    for x0, y0, x1, y1 in lines.tolist():
+        # Negative slice bounds would wrap around to the other end of the
+        # image, so clamp them to the page.
+        if (x1 - x0) <= (y1 - y0):
+            image[max(y0, 0) : max(y1, 0), max(x0 - 1, 0) : max(x1 + 1, 0)] = 0
+        else:
+            image[max(y0 - 1, 0) : max(y1 + 1, 0), max(x0, 0) : max(x1, 0)] = 0
+    return image
+
+
+# 4-connectivity structuring element for ndimage.label
+LABEL_STRUCTURE = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 0]], dtype=np.uint8)
+
+
 def segment_plate_into_rectangles(plate, drawings, debug=False):
     """
     Takes the plate pdf and returns a list of each Rectangle in the plate.
@@ -52,7 +70,8 @@ def segment_plate_into_rectangles(plate, drawings, debug=False):
     and marked with its index.
     """
     # Create a list of lines throughout the page. Internally these are
-    # pymupdf.Rect instances.
+    # (x0, y0, x1, y1) tuples of the raw end points, the rounding and
+    # filtering happens on all of them at once below.
     lines = []
 
     for path in drawings:
@@ -64,70 +83,64 @@ def segment_plate_into_rectangles(plate, drawings, debug=False):
                     item = ("re", as_rect)
 
             if item[0] == "l":  # line
-                if abs(item[1].x - item[2].x) < 2:
-                    lines.append(line_segment_as_rect_from_points(item[1], item[2]))
-                elif abs(item[1].y - item[2].y) < 2:
-                    lines.append(line_segment_as_rect_from_points(item[1], item[2]))
+                lines.append((item[1].x, item[1].y, item[2].x, item[2].y))
             elif item[0] == "re":  # rectangle
                 # Rectangles have two vertical and two horizontal lines.
-                lines.append(
-                    line_segment_as_rect_from_points(
-                        item[1].top_left, item[1].bottom_left
-                    )
-                )
-                lines.append(
-                    line_segment_as_rect_from_points(
-                        item[1].top_right, item[1].bottom_right
-                    )
-                )
-                lines.append(
-                    line_segment_as_rect_from_points(
-                        item[1].top_left, item[1].top_right
-                    )
-                )
-                lines.append(
-                    line_segment_as_rect_from_points(
-                        item[1].bottom_left, item[1].bottom_right
-                    )
-                )
+                x0, y0, x1, y1 = item[1]
+                lines.append((x0, y0, x0, y1))
+                lines.append((x1, y0, x1, y1))
+                lines.append((x0, y0, x1, y0))
+                lines.append((x0, y1, x1, y1))
             else:
                 continue
 
+    lines = np.array(lines, dtype=np.float64).reshape(-1, 4)
+    # Only keep the (nearly) horizontal and vertical lines.
+    is_straight = (np.abs(lines[:, 0] - lines[:, 2]) < 2) | (
+        np.abs(lines[:, 1] - lines[:, 3]) < 2
+    )
+    lines = np.round(lines, 1)
+    # Normalize the lines such that x0 <= x1 and y0 <= y1.
+    lines = np.column_stack(
+        (
+            np.minimum(lines[:, 0], lines[:, 2]),
+            np.minimum(lines[:, 1], lines[:, 3]),
+            np.maximum(lines[:, 0], lines[:, 2]),
+            np.maximum(lines[:, 1], lines[:, 3]),
+        )
+    )[is_straight]
     # Filter out short lines.
-    lines = [line for line in lines if line.width > 6 or line.height > 6]
+    is_long = ((lines[:, 2] - lines[:, 0]) > 6) | ((lines[:, 3] - lines[:, 1]) > 6)
+    # Round the lines to whole points and get rid of duplicates, neighbouring
+    # boxes on the plate often report the same shared edge.
+    lines = np.unique(np.round(lines[is_long]), axis=0)
 
     # Create an image with just the horizontal and vertical lines so we can
     # segment out the rectangles.
-    segmented = pymupdf.Document()
-    outpage = segmented.new_page(width=plate.rect.width, height=plate.rect.height)
-    shape = outpage.new_shape()
-    for line in lines:
-        rounded_tl = round(line.top_left.x, 0), round(line.top_left.y, 0)
-        rounded_br = round(line.bottom_right.x, 0), round(line.bottom_right.y, 0)
-        shape.draw_line(rounded_tl, rounded_br)
-        shape.finish(color=(0, 0, 0))  # line color
-    shape.commit()
-
-    # Get pixmap in grayscale.
-    pixmap = outpage.get_pixmap(colorspace=pymupdf.csGRAY)
-    samples = pixmap.samples_mv
-    # Threshold the image and then have scikit make labels.
-    img = np.asarray(samples).reshape((pixmap.h, pixmap.w))
+    width, height = int(np.ceil(plate.rect.width)), int(np.ceil(plate.rect.height))
+    # The regions we care about are the areas in between the lines, draw those
+    # straight into the uint8 image ndimage.label works on.
+    binary = rasterize_lines(lines.astype(np.int64), width, height)
     if debug:
-        skimage.io.imsave("lines.png", img)
-    img_grayscale = img.copy()
-    img_grayscale[img_grayscale < 10] = 0
+        skimage.io.imsave("lines.png", binary * np.uint8(255))
+
+    # Label the different regions of the image. The cross shaped structure
+    # only connects pixels horizontally and vertically, i.e connectivity=1.
+    label_image, _ = ndimage.label(binary, structure=LABEL_STRUCTURE)
 
-    # Use scikit image to label different parts of the image.
-    label_image = skimage.measure.label(img_grayscale, connectivity=1)
+    # We only need the size and bounding box of each region, so grab those
+    # directly rather than building full regionprops objects.
+    region_areas = np.bincount(label_image.ravel())
+    region_slices = ndimage.find_objects(label_image)
 
     segments = []
-    for region in skimage.measure.regionprops(label_image):
+    for label, region_slice in enumerate(region_slices, start=1):
         # Skip any small regions.
-        if region.area < 30:
+        if region_slice is None or region_areas[label] < 30:
             continue
 
-        (y0, x0, y1, x1) = region.bbox
+        y0, y1 = region_slice[0].start, region_slice[0].stop
+        x0, x1 = region_slice[1].start, region_slice[1].stop
         # Avoid the region that covers the whole page.
         if x0 == 0 and y0 == 0:
             continue
@@ -141,7 +154,12 @@ def segment_plate_into_rectangles(plate, drawings, debug=False):
     if debug:
         import random
 
+        segmented = pymupdf.Document()
+        outpage = segmented.new_page(width=plate.rect.width, height=plate.rect.height)
         shape = outpage.new_shape()
+        for x0, y0, x1, y1 in lines.tolist():
+            shape.draw_line((x0, y0), (x1, y1))
+            shape.finish(color=(0, 0, 0))  # line color
         # Draw all segmented boxes.
         for rect in segments:
             shape.draw_rect(rect)
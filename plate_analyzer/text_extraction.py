@@ -1,7 +1,8 @@
 import pymupdf
+import numpy as np
+from scipy import spatial
 
 from . import drawing_extraction
-from .segmentation import round_to_nearest
 
 import collections
 import re
@@ -9,14 +10,14 @@ from dataclasses import dataclass
 from typing import Optional, List, Tuple, Dict
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class PlateComments:
     non_standard_takeoff_minimums: bool
     non_standard_alternative_requirements: bool
     comments: str
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ApproachMinimum:
     # e.g 3000 altitude 3/4 visibility
     altitude: str
@@ -24,7 +25,7 @@ class ApproachMinimum:
     visibility: Optional[str]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ApproachCategory:
     approach_type: str
     # Altitude, visibility for each category. If None, approach is not allowed.
@@ -49,7 +50,7 @@ class Waypoint:
         self.is_final_approach_fix = False
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SegmentedPlate:
     approach_name: str
     airport_name: str
@@ -68,6 +69,86 @@ class SegmentedPlate:
     approach_minimums: List[ApproachCategory]
 
 
+class PlateText:
+    """
+    Every character on a plate's textpage, pulled out in a single pass.
+
+    `plate.get_textbox` walks the entire textpage on every call, which adds up
+    quickly when we want the text of most of the rectangles on the plate. This
+    extracts the characters once and answers the same queries by filtering on
+    the character bounding boxes.
+
+    The one difference is that the rawdict extraction this is built from leaves
+    out characters that lie outside the page's mediabox, which `get_textbox`
+    would still return.
+    """
+
+    def __init__(self, textpage: pymupdf.TextPage):
+        chars = []
+        bboxes = []
+        line_numbers = []
+
+        line_number = 0
+        for block in textpage.extractRAWDICT()["blocks"]:
+            for line in block.get("lines", []):
+                for span in line["spans"]:
+                    for char in span["chars"]:
+                        chars.append(char["c"])
+                        bboxes.append(char["bbox"])
+                        line_numbers.append(line_number)
+                line_number += 1
+
+        self.chars = chars
+        self.bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+        self.line_numbers = np.array(line_numbers, dtype=np.int64)
+        self.rectangle_texts = {}
+
+    def index_rectangles(self, rects: List[pymupdf.Rect]):
+        """Pre-computes the text inside each of `rects` with one vectorized
+        overlap test, so later `textbox` calls for them are just lookups."""
+        if len(rects) == 0:
+            return
+        rect_array = np.array([tuple(r) for r in rects], dtype=np.float64)
+        bboxes = self.bboxes
+        # overlaps[i, j] is whether character j overlaps rects[i].
+        overlaps = (
+            (bboxes[None, :, 0] < rect_array[:, None, 2])
+            & (bboxes[None, :, 2] > rect_array[:, None, 0])
+            & (bboxes[None, :, 1] < rect_array[:, None, 3])
+            & (bboxes[None, :, 3] > rect_array[:, None, 1])
+        )
+        for rect, rect_overlaps in zip(rects, overlaps):
+            self.rectangle_texts[rect] = self._join_chars(np.flatnonzero(rect_overlaps))
+
+    def textbox(self, rect: pymupdf.Rect) -> str:
+        """Equivalent of `plate.get_textbox(rect)`: all the characters that
+        overlap `rect`, with a newline between each line of text."""
+        if rect in self.rectangle_texts:
+            return self.rectangle_texts[rect]
+
+        bboxes = self.bboxes
+        overlaps = (
+            (bboxes[:, 0] < rect.x1)
+            & (bboxes[:, 2] > rect.x0)
+            & (bboxes[:, 1] < rect.y1)
+            & (bboxes[:, 3] > rect.y0)
+        )
+        return self._join_chars(np.flatnonzero(overlaps))
+
+    def _join_chars(self, indices: np.ndarray) -> str:
+        line_breaks = np.flatnonzero(np.diff(self.line_numbers[indices])) + 1
+        return "\n".join(
+            "".join(self.chars[i] for i in line)
+            for line in np.split(indices, line_breaks)
+        )
+
+
+# Solitary T (takeoff minimums) and A (alternate minimums) symbols at the start
+# and end of the comments text.
+COMMENTS_LEADING_SYMBOL_REGEX = re.compile(r"^\b(T|A)\b")
+COMMENTS_TRAILING_SYMBOL_REGEX = re.compile(r"\b(T|A)\b$")
+
+
 def extract_text_from_segmented_plate(
     plate: pymupdf.Page, drawings, textpage, rectangles: List[pymupdf.Rect], debug=False
 ) -> SegmentedPlate:
@@ -83,31 +164,40 @@ def extract_text_from_segmented_plate(
     # rectangle_layout[0] = [r1, r2, r3]
     # rectangle_layout[1] = [r4, r5, r6, r7, r8]
     # rectangle_layout[2] = [r9, r10]
-    rectangles.sort(key=lambda rect: (rect.top_left.y, rect.top_left.x))
-    rectangle_layout = []
-    previous_y = -1
-    for r in rectangles:
-        rectangle_y = round(r.top_left.y, 1)
-        if previous_y != rectangle_y:
-            rectangle_layout.append([])
-            previous_y = rectangle_y
-        rectangle_layout[-1].append(r)
+    page_width = plate.rect.width
+    bounds = np.array([tuple(r) for r in rectangles], dtype=np.float64).reshape(-1, 4)
+    # Sort by y and then x.
+    order = np.lexsort((bounds[:, 0], bounds[:, 1]))
+    rectangles = [rectangles[i] for i in order]
+    bounds = bounds[order]
+    # The largest rectangle is probably the plan view, note it while we have
+    # all the bounds handy.
+    areas = (bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])
+    largest_rect = rectangles[int(np.argmax(areas))]
+    # A new row starts wherever the y-coordinate changes.
+    row_starts = np.flatnonzero(np.diff(np.round(bounds[:, 1], 1))) + 1
+    row_bounds = [0, *row_starts.tolist(), len(rectangles)]
+    rectangle_layout = [
+        rectangles[start:end] for start, end in zip(row_bounds, row_bounds[1:])
+    ]
+
+    # Grab the text inside every rectangle in one go.
+    plate_text = PlateText(textpage)
+    plate_text.index_rectangles(rectangles)
 
     approach_course_box = rectangle_layout[0][1]
     # Some RNP approaches do not have a channel/ILS box on the top-left
     if len(rectangle_layout[0]) == 2:
         approach_course_box = rectangle_layout[0][0]
     approach_text = (
-        plate.get_textbox(approach_course_box, textpage=textpage)
-        .replace("APP CRS", "")
-        .strip()
+        plate_text.textbox(approach_course_box).replace("APP CRS", "").strip()
     )
 
     # Approach title will be on the right side of the page, after the approach
     # course and info boxes on the left.
     approach_title_area = pymupdf.Rect(
         rectangle_layout[0][-1].top_right + pymupdf.Point(30, 0),
-        pymupdf.Point(plate.rect.width, rectangle_layout[0][-1].bottom_right.y),
+        pymupdf.Point(page_width, rectangle_layout[0][-1].bottom_right.y),
     )
     approach_title = plate.get_text(option="words", sort=True, clip=approach_title_area)
     approach_title = pymupdf_group_words_into_lines_based_on_vertical_position(
@@ -137,27 +227,34 @@ def extract_text_from_segmented_plate(
     approach_name, airport_name = approach_title
 
     # Get all the waypoints in the plan view.
-    plan_view_box = find_plan_view_box(rectangle_layout, plate)
-    waypoints = extract_all_waypoints_from_plan_view(plan_view_box, plate)
+    plan_view_box = find_plan_view_box(largest_rect, plate)
+    # The waypoint and DME arc searches both look at the text in the plan view,
+    # so build its textpage once for both.
+    plan_view_textpage = plate.get_textpage(
+        clip=plan_view_box, flags=pymupdf.TEXTFLAGS_WORDS
+    )
+    waypoints = extract_all_waypoints_from_plan_view(plan_view_textpage, plate)
     (has_hold_in_lieu, has_procedure_turn) = (
         drawing_extraction.extract_approach_metadata(
             plan_view_box, plate, drawings, debug=debug
         )
     )
-    has_dme_arc = has_dme_arc_in_plan_view(plan_view_box, plate)
+    has_dme_arc = has_dme_arc_in_plan_view(plan_view_textpage, plate)
 
     # Look for "MISSED APPROACH" on rows 0 to 4 for the missed approach
     # instructions.
-    missed_approach_rect = None
-    for i in range(0, 3):
-        for rect in rectangle_layout[i]:
-            rect_text = plate.get_textbox(rect, textpage=textpage)
-            if "MISSED" not in rect_text:
-                continue
-            # HACK: RNAV 22 for FLP has a typo. (Reported to the FAA)
-            if "APPROACH" not in rect_text and "APROACH" not in rect_text:
-                continue
-            missed_approach_rect = rect
+    def is_missed_approach_box(rect):
+        rect_text = plate_text.textbox(rect)
+        if "MISSED" not in rect_text:
+            return False
+        # HACK: RNAV 22 for FLP has a typo. (Reported to the FAA)
+        return "APPROACH" in rect_text or "APROACH" in rect_text
+
+    # If more than one box matches, the last one wins, so search backwards.
+    missed_approach_rect = find_rect(
+        [reversed(row) for row in reversed(rectangle_layout[0:3])],
+        is_missed_approach_box,
+    )
 
     if missed_approach_rect is None:
         raise ValueError("Could not find missed approach instructions")
@@ -172,19 +269,13 @@ def extract_text_from_segmented_plate(
 
     # Comments box will be more than a third the width of the document, and
     # its bottom will line up with the missed approach box.
-    comments_box = None
-    for i in (
-        1,
-        2,
-        3,
-    ):
-        for rect in rectangle_layout[i]:
-            if (
-                rect.width > (plate.rect.width * 0.3)
-                and abs(rect.bottom_left.y - missed_approach_rect.bottom_left.y) < 3
-            ):
-                comments_box = rect
-                break
+    # Within a row the first match wins but a later row overrides an earlier
+    # one, so search the rows backwards.
+    comments_box = find_rect(
+        reversed(rectangle_layout[1:4]),
+        lambda rect: rect.width > (page_width * 0.3)
+        and abs(rect.y1 - missed_approach_rect.y1) < 3,
+    )
     if comments_box is None:
         raise ValueError("Could not find comments box")
     # The left side of the comments box will have a "T" for non-standard takeoff
@@ -195,7 +286,7 @@ def extract_text_from_segmented_plate(
     left_side_comments = pymupdf.Rect(
         comments_box.top_left, comments_box.bottom_left + pymupdf.Point(10, 0)
     )
-    left_side_text = plate.get_textbox(rect=left_side_comments, textpage=textpage)
+    left_side_text = plate_text.textbox(left_side_comments)
     if "A" in left_side_text:
         non_standard_takeoff_minimums = True
     if "T" in left_side_text:
@@ -208,8 +299,12 @@ def extract_text_from_segmented_plate(
     comments_text = pymupdf_extracted_words_to_string(comments_text)
     # Remove solitary As and Ts from the start and end of comments. More than
     # likely just accidentally included the alternatives symbols.
-    comments_text = re.sub(r"^\b(T|A)\b", "", comments_text, count=2).strip()
-    comments_text = re.sub(r"\b(T|A)\b$", "", comments_text, count=2).strip()
+    comments_text = COMMENTS_LEADING_SYMBOL_REGEX.sub(
+        "", comments_text, count=2
+    ).strip()
+    comments_text = COMMENTS_TRAILING_SYMBOL_REGEX.sub(
+        "", comments_text, count=2
+    ).strip()
 
     comments = PlateComments(
         non_standard_takeoff_minimums,
@@ -219,16 +314,13 @@ def extract_text_from_segmented_plate(
 
     # If there is a required equipment box, it will be a narrow one above the
     # comments.
-    required_equipment = None
-    for i in (0, 1, 2):
-        for rect in rectangle_layout[i]:
-            if (
-                rect != comments_box
-                and int(rect.width - comments_box.width) == 0
-                and rect.top_left.y < comments_box.top_left.y
-            ):
-                required_equipment = rect
-                break
+    # As above, a later row overrides an earlier one.
+    required_equipment = find_rect(
+        reversed(rectangle_layout[0:3]),
+        lambda rect: rect != comments_box
+        and int(rect.width - comments_box.width) == 0
+        and rect.y0 < comments_box.y0,
+    )
 
     if required_equipment:
         required_equipment_text = plate.get_text(
@@ -240,7 +332,7 @@ def extract_text_from_segmented_plate(
         )
 
     try:
-        minimums = extract_minimums(rectangle_layout, plate=plate, textpage=textpage)
+        minimums = extract_minimums(rectangle_layout, plate, plate_text)
     except ValueError:
         minimums = []
 
@@ -262,33 +354,44 @@ def extract_text_from_segmented_plate(
 CATEGORIES = "ABCD"
 
 
+def find_rect(rows, predicate) -> Optional[pymupdf.Rect]:
+    """Returns the first rectangle in `rows`, an iterable of rows of
+    rectangles, that `predicate` is true for. None if there isn't one."""
+    for row in rows:
+        for rect in row:
+            if predicate(rect):
+                return rect
+    return None
+
+
 def extract_minimums(
-    rectangle_layout, plate: pymupdf.Page, textpage
+    rectangle_layout, plate: pymupdf.Page, plate_text: PlateText
 ) -> List[ApproachCategory]:
-    # Locate the rectangle that says "CATEGORY"
-    category_rect = None
-    for i in range(len(rectangle_layout) - 1, 0, -1):
-        for j, rect in enumerate(rectangle_layout[i]):
-            rect_text = plate.get_textbox(rect, textpage=textpage).strip()
-            if "CATEGORY" in rect_text:
-                category_rect = rect
+    # Locate the rectangle that says "CATEGORY". If more than one box says it,
+    # the top-most, right-most one is the header, so search in that order.
+    category_rect = find_rect(
+        [reversed(row) for row in rectangle_layout[1:]],
+        lambda rect: "CATEGORY" in plate_text.textbox(rect),
+    )
 
     if category_rect is None:
         raise ValueError("Unable to find CATEGORY box")
 
     # Filter out any rectangles that are above or the left of the minimums.
-    filtered_rectangles = []
-    for row in rectangle_layout:
-        filtered_row = []
-        for rect in row:
-            if (rect.top_left.x + 0.5) > category_rect.top_left.x and (
-                rect.top_left.y + 0.5
-            ) > category_rect.top_left.y:
-                filtered_row.append(rect)
-        if len(filtered_row) != 0:
-            filtered_rectangles.append(filtered_row)
-
-    rectangle_layout = filtered_rectangles
+    flat_rectangles = [rect for row in rectangle_layout for rect in row]
+    row_numbers = np.repeat(
+        np.arange(len(rectangle_layout)), [len(row) for row in rectangle_layout]
+    )
+    top_lefts = np.array([(r.x0, r.y0) for r in flat_rectangles], dtype=np.float64)
+    is_minimums_rect = (top_lefts[:, 0] + 0.5 > category_rect.x0) & (
+        top_lefts[:, 1] + 0.5 > category_rect.y0
+    )
+    # Regroup what's left back into their rows, dropping any empty rows.
+    kept = np.flatnonzero(is_minimums_rect)
+    row_starts = np.flatnonzero(np.diff(row_numbers[kept])) + 1
+    rectangle_layout = [
+        [flat_rectangles[i] for i in row] for row in np.split(kept, row_starts)
+    ]
 
     if len(rectangle_layout[0]) < 4:
         raise ValueError("Not enough letter boxes after CATEGORY")
@@ -297,13 +400,16 @@ def extract_minimums(
     category_boxes = []
     for i, letter in enumerate(CATEGORIES):
         letter_rect = rectangle_layout[0][i + 1]
-        letter_text = plate.get_textbox(letter_rect, textpage=textpage).strip()
+        letter_text = plate_text.textbox(letter_rect).strip()
         if letter_text != letter:
             raise ValueError(
                 f"letter {i} after CATEGORY should be {letter}, was {letter_text}"
             )
         category_boxes.append(letter_rect)
     categories_width = sum([cat_box.width for cat_box in category_boxes])
+    # Width of a minimums box covering a single category.
+    category_width = categories_width / 4
+    category_rect_width = int(category_rect.width)
 
     # Grab the first approach name.
     all_minimums = []
@@ -313,9 +419,9 @@ def extract_minimums(
     for i in range(1, len(rectangle_layout)):
         approach_name_rect = rectangle_layout[i][0]
         # Should be the same size as the category cell and have some text.
-        if int(approach_name_rect.width) != int(category_rect.width):
+        if int(approach_name_rect.width) != category_rect_width:
             break
-        approach_name = plate.get_textbox(approach_name_rect, textpage=textpage)
+        approach_name = plate_text.textbox(approach_name_rect)
         if len(approach_name.strip()) == 0:
             break
         # Remove the Decision Altitude/Minimum Descent Altitude suffix, and fix
@@ -342,12 +448,9 @@ def extract_minimums(
             )
             # Check the width of the minimums box to see how many categories it
             # covers.
-            num_categories_covered = int(
-                round(minimums_box.width / (categories_width / 4), 0)
-            )
-            for _ in range(num_categories_covered):
-                minimums_per_category.append(minimums)
-                num_minimums += 1
+            num_categories_covered = int(round(minimums_box.width / category_width, 0))
+            minimums_per_category.extend([minimums] * num_categories_covered)
+            num_minimums += num_categories_covered
             j += 1
 
         # Some plates have special category E for very fast military planes.
@@ -370,29 +473,51 @@ MINIMUMS_TEXT_NEXT_LINE_THRESHOLD = 4
 FRACTION_HEIGHT_PERCENTAGE = 0.8
 
 
-def get_minimums_text_letters(box, plate):
-    # Gets the letters from a minimums box.
-    raw_text = plate.get_text(option="rawdict", clip=box)
+@dataclass
+class MinimumsLetters:
+    """The characters of a minimums box, sorted by their x-coordinate."""
+
+    # e.g "1446-½"
+    text: str
+    # (x, y) origin of each character.
+    origins: np.ndarray
+    # Height of each character's bounding box.
+    heights: np.ndarray
+
+    def __len__(self):
+        return len(self.text)
+
 
-    letters = []
+def get_minimums_text_letters(box_textpage, plate) -> MinimumsLetters:
+    # Gets the letters from a minimums box, given its clipped textpage.
+    raw_text = plate.get_text(option="rawdict", textpage=box_textpage)
+
+    chars = []
+    origins = []
+    bboxes = []
     for block in raw_text["blocks"]:
         for line in block["lines"]:
             for span in line["spans"]:
                 for char in span["chars"]:
-                    letters.append(char)
-
-    # Remove any characters that are very far apart vertically from the first line.
-    min_y = min(letter["origin"][1] for letter in letters)
-    filtered_letters = []
-    for letter in letters:
-        if abs(letter["origin"][1] - min_y) < MINIMUMS_TEXT_NEXT_LINE_THRESHOLD:
-            filtered_letters.append(letter)
-    letters = filtered_letters
-
-    # Remove spaces.
-    letters = [l for l in letters if l["c"] != " "]
+                    chars.append(char["c"])
+                    origins.append(char["origin"])
+                    bboxes.append(char["bbox"])
+    chars = np.array(chars, dtype=str)
+    origins = np.array(origins, dtype=np.float64).reshape(-1, 2)
+    bboxes = np.array(bboxes, dtype=np.float64).reshape(-1, 4)
+
+    # Remove any characters that are very far apart vertically from the first
+    # line, and any spaces.
+    min_y = origins[:, 1].min()
+    keep = (np.abs(origins[:, 1] - min_y) < MINIMUMS_TEXT_NEXT_LINE_THRESHOLD) & (
+        chars != " "
+    )
     # Sort by x-cordinate.
-    letters.sort(key=lambda c: c["origin"][0])
+    order = np.flatnonzero(keep)
+    order = order[np.argsort(origins[order, 0], kind="stable")]
+    chars = chars[order]
+    origins = origins[order]
+    heights = bboxes[order, 3] - bboxes[order, 1]
 
     # HACK: occasionally, we will have dashes where the fraction that comes
     # after actually has a x-coordinate that is before the dash. For example:
@@ -401,30 +526,32 @@ def get_minimums_text_letters(box, plate):
     # '-': origin (145.92, 515.07)
     #
     # So if we detect a "small" letter right before a dash, swap them.
-    for i, letter in enumerate(letters):
-        if i <= 0 or letter["c"] != "-":
+    for i in np.flatnonzero(chars == "-"):
+        if i <= 0:
             continue
         # Okay we have a dash, check the letter before it.
-        letter_before = letters[i - 1]
         # Check if they're close together.
-        if letter["origin"][0] - letter_before["origin"][0] > 0.8:
+        if origins[i, 0] - origins[i - 1, 0] > 0.8:
             continue
 
         # See if it's a fraction compared to the dash.
-        letter_before_height = letter_before["bbox"][3] - letter_before["bbox"][1]
-        dash_height = letter["bbox"][3] - letter["bbox"][1]
-        if letter_before_height < dash_height * FRACTION_HEIGHT_PERCENTAGE:
+        if heights[i - 1] < heights[i] * FRACTION_HEIGHT_PERCENTAGE:
             # Swap the letters, this was likely just the dash being too close
             # to the fraction.
-            letters[i] = letter_before
-            letters[i - 1] = letter
+            swap = [i, i - 1]
+            chars[[i - 1, i]] = chars[swap]
+            origins[[i - 1, i]] = origins[swap]
+            heights[[i - 1, i]] = heights[swap]
 
-    return letters
+    return MinimumsLetters(text="".join(chars), origins=origins, heights=heights)
 
 
 def extract_minimums_from_text_box(box, minimum_type, plate) -> ApproachMinimum:
+    # Both the text and the letters come from the same clip of the page, so
+    # only build the textpage for it once.
+    box_textpage = plate.get_textpage(clip=box, flags=pymupdf.TEXTFLAGS_TEXT)
     # Check if the procedure is allowed for this category.
-    text = plate.get_text(option="text", clip=box).strip()
+    text = plate.get_text(option="text", textpage=box_textpage).strip()
     if "NA" in text:
         return None
     # If the text "CAT" appears in the box, this is a special ILS cat approach,
@@ -432,58 +559,43 @@ def extract_minimums_from_text_box(box, minimum_type, plate) -> ApproachMinimum:
     if "CAT" in text:
         return "Unknown"
 
-    letters = get_minimums_text_letters(box, plate)
-    # Gets set to visibility or rvr depending on what we're expecting next.
-    next_number = None
-    altitude = ""
-    # Scan for the altitude first.
-    for i, letter in enumerate(letters):
-        # Dash separates altitude from visibility
-        if letter["c"] == "-":
-            next_number = "visibility"
-            break
-        # Slash separates rvr from visibility
-        if letter["c"] == "/":
-            next_number = "rvr"
-            break
-        altitude += letter["c"]
+    letters = get_minimums_text_letters(box_textpage, plate)
+    letter_text = letters.text
+    # Scan for the altitude first. A dash separates the altitude from the
+    # visibility and a slash separates it from the rvr.
+    separator = re.search(r"[-/]", letter_text)
 
     # Weird, no altitude or rvr seperator. something must have gone wrong.
-    if next_number is None:
+    if separator is None:
         print(minimum_type, letters)
         raise ValueError("No slash or dash in minimums box")
 
+    i = separator.start()
+    altitude = letter_text[:i]
+    next_number = "visibility" if separator.group() == "-" else "rvr"
+
     rvr = None
     visibility = None
 
     if next_number == "visibility":
         # A visibility will either be a single digit like '1', a fraction like ½
         # or a mixed fraction like 1 ½.
-        first_number = letters[i + 1]
-        visibility = first_number["c"]
+        visibility = letter_text[i + 1]
         # Check if the first number is a fraction numerator by checking its
         # size against the altitude number.
-        first_number_bbox = pymupdf.Rect(first_number["bbox"])
-        first_letter_bbox = pymupdf.Rect(letters[0]["bbox"])
-        if (
-            first_number_bbox.height
-            < first_letter_bbox.height * FRACTION_HEIGHT_PERCENTAGE
-        ):
-            visibility = f"{visibility}/{letters[i + 2]['c']}"
+        fraction_height = letters.heights[0] * FRACTION_HEIGHT_PERCENTAGE
+        if letters.heights[i + 1] < fraction_height:
+            visibility = f"{visibility}/{letter_text[i + 2]}"
         elif len(letters) > (i + 3):
             # First number was not a fraction, so this could be a single number
             # or a mixed fraction. Check if the next number is a fraction.
-            second_number_bbox = pymupdf.Rect(letters[i + 2]["bbox"])
-            if (
-                second_number_bbox.height
-                < first_letter_bbox.height * FRACTION_HEIGHT_PERCENTAGE
-            ):
+            if letters.heights[i + 2] < fraction_height:
                 # Okay, next should be a fraction since it's close to the first
                 # number.
-                visibility = f"{visibility} {letters[i + 2]['c']}/{letters[i + 3]['c']}"
+                visibility = f"{visibility} {letter_text[i + 2]}/{letter_text[i + 3]}"
     elif next_number == "rvr":
         # RVR could be up to two numbers
-        rvr = f"{letters[i + 1]["c"]}{letters[i + 2]["c"]}"
+        rvr = f"{letter_text[i + 1]}{letter_text[i + 2]}"
     else:
         raise NotImplemented()
 
@@ -501,18 +613,21 @@ def pymupdf_extracted_words_to_string(words):
 def pymupdf_group_words_into_lines_based_on_vertical_position(words):
     """Joins a list of extracted words into lines as above but returns a list
     of lines, grouping them based on their y-coordinate."""
-    # Sort by x only
-    words.sort(key=lambda w: w[0])
-
-    words_grouped_by_y = collections.defaultdict(list)
-    for w in words:
-        y = (w[1] + w[3]) / 2
-        y_round = round_to_nearest(y, nearest=6)
-        words_grouped_by_y[y_round].append(w[4].strip())
+    if len(words) == 0:
+        return []
+    bounds = np.array([w[:4] for w in words], dtype=np.float64)
+    xs = bounds[:, 0]
+    # Round the vertical center of each word to the nearest 6, the same as
+    # `round_to_nearest` does. np.round rounds halves to even like round().
+    ys = (bounds[:, 1] + bounds[:, 3]) / 2
+    y_rounds = 6 * np.round(np.round(ys) / 6)
+    # Sort by the rounded y and then by x, each run of the same y is a line.
+    order = np.lexsort((xs, y_rounds))
+    line_starts = np.flatnonzero(np.diff(y_rounds[order])) + 1
 
     lines = []
-    for y in sorted(words_grouped_by_y.keys()):
-        lines.append(" ".join(words_grouped_by_y[y]))
+    for line in np.split(order, line_starts):
+        lines.append(" ".join(words[i][4].strip() for i in line))
     return lines
 
 
@@ -521,67 +636,68 @@ def pymupdf_group_words_into_lines_based_on_vertical_position(words):
 FIX_TEXT_DISTANCE_THRESHOLD = 25
 
 
-def is_waypoint_text_close_to_approach_type(waypoint_loc, approach_fixes):
-    is_close = False
-    for initial_appraoch_fix in approach_fixes:
-        iaf_location = pymupdf.Point(initial_appraoch_fix[2], initial_appraoch_fix[3])
-        distance = iaf_location.distance_to(waypoint_loc)
-        if distance < FIX_TEXT_DISTANCE_THRESHOLD:
-            is_close = True
-    return is_close
+def is_waypoint_text_close_to_approach_type(waypoint_locs, approach_fixes):
+    """For each location in `waypoint_locs`, returns whether any of the
+    `approach_fixes` texts are within FIX_TEXT_DISTANCE_THRESHOLD of it."""
+    if len(waypoint_locs) == 0 or len(approach_fixes) == 0:
+        return np.zeros(len(waypoint_locs), dtype=bool)
+    fix_locations = np.array([(fix[2], fix[3]) for fix in approach_fixes])
+    closest_fix_distance, _ = spatial.cKDTree(fix_locations).query(waypoint_locs)
+    return closest_fix_distance < FIX_TEXT_DISTANCE_THRESHOLD
 
 
-def extract_all_waypoints_from_plan_view(plan_view_box, plate):
-    words = plate.get_text(option="words", sort=True, clip=plan_view_box)
+def extract_all_waypoints_from_plan_view(plan_view_textpage, plate):
+    words = plate.get_text(option="words", sort=True, textpage=plan_view_textpage)
 
     initial_approach_fix_texts = []
     intermediate_fix_texts = []
     final_approach_fix_texts = []
+    waypoint_words = []
     for w in words:
         word = w[4].strip()
-        if (not word.startswith("(")) or (not word.endswith(")")):
-            continue
-        if "IAF" in word:
-            initial_approach_fix_texts.append(w)
-        if "IF" in word:
-            intermediate_fix_texts.append(w)
-        if "FAF" in word:
-            final_approach_fix_texts.append(w)
+        if word.startswith("(") and word.endswith(")"):
+            if "IAF" in word:
+                initial_approach_fix_texts.append(w)
+            if "IF" in word:
+                intermediate_fix_texts.append(w)
+            if "FAF" in word:
+                final_approach_fix_texts.append(w)
+        # Waypoints are generally 5 uppercase letters.
+        elif len(word) == 5 and word.isalpha() and word.upper() == word:
+            waypoint_words.append(w)
+
+    # See if each waypoint is an initial approach fix etc by looking for the
+    # text IAF nearby.
+    waypoint_locations = np.array([(w[0], w[1]) for w in waypoint_words]).reshape(-1, 2)
+    is_initial_approach_fix = is_waypoint_text_close_to_approach_type(
+        waypoint_locations, initial_approach_fix_texts
+    )
+    is_intermediate_fix = is_waypoint_text_close_to_approach_type(
+        waypoint_locations, intermediate_fix_texts
+    )
+    is_final_approach_fix = is_waypoint_text_close_to_approach_type(
+        waypoint_locations, final_approach_fix_texts
+    )
 
     waypoints = collections.defaultdict(Waypoint)
-    for w in words:
+    for i, w in enumerate(waypoint_words):
         word = w[4].strip()
-        # Waypoints are generally 5 uppercase letters.
-        if len(word) != 5 or (not word.isalpha()) or word.upper() != word:
-            continue
-        # See if this is an initial approach fix by looking for the text IAF
-        # nearby.
-        word_location = pymupdf.Point(w[0], w[1])
-
-        is_initial_approach_fix = is_waypoint_text_close_to_approach_type(
-            word_location, initial_approach_fix_texts
-        )
-        is_intermediate_fix = is_waypoint_text_close_to_approach_type(
-            word_location, intermediate_fix_texts
-        )
-        is_final_approach_fix = is_waypoint_text_close_to_approach_type(
-            word_location, final_approach_fix_texts
-        )
         # Set if the fix is IAF/IF/FAF based on what we saw here, updating any
         # previous bools.
-        waypoints[word].is_initial_approach_fix |= is_initial_approach_fix
-        waypoints[word].is_intermediate_fix |= is_intermediate_fix
-        waypoints[word].is_final_approach_fix |= is_final_approach_fix
+        waypoints[word].is_initial_approach_fix |= bool(is_initial_approach_fix[i])
+        waypoints[word].is_intermediate_fix |= bool(is_intermediate_fix[i])
+        waypoints[word].is_final_approach_fix |= bool(is_final_approach_fix[i])
 
     return waypoints
 
 
-def has_dme_arc_in_plan_view(plan_view_box, plate):
+def has_dme_arc_in_plan_view(plan_view_textpage, plate):
     """Look for the words 'Arc' in the plan view, this is slightly complicated
     by the fact that the words can be curved. This means we can't just use
     pymupdf's word extaction directly to find it.
     """
-    words = plate.get_text(option="rawdict", sort=True, clip=plan_view_box)
+    # Only the character locations matter here, so skip sorting the blocks.
+    words = plate.get_text(option="rawdict", textpage=plan_view_textpage)
 
     letter_locations = collections.defaultdict(list)
 
@@ -591,42 +707,27 @@ def has_dme_arc_in_plan_view(plan_view_box, plate):
                 for char in span["chars"]:
                     # Note the locations of all 'A', 'r' and 'c' characters.
                     if char["c"] in ("A", "r", "c"):
-                        letter_locations[char["c"]].append(
-                            pymupdf.Point(char["origin"])
-                        )
+                        letter_locations[char["c"]].append(char["origin"])
 
-    if len(letter_locations["r"]) == 0 or len(letter_locations["c"]) == 0:
+    if any(len(letter_locations[letter]) == 0 for letter in ("A", "r", "c")):
         return False
 
-    # Iterate through all the 'A' characters.
-    for a_location in letter_locations["A"]:
-        # Check distances to the closest 'r' character.
-        closest_r = min([r.distance_to(a_location) for r in letter_locations["r"]])
-        if closest_r > 6:
-            continue
-        closest_c = min([c.distance_to(a_location) for c in letter_locations["c"]])
-        if closest_c > 8:
-            continue
-        return True
-
-    return False
-
+    # Distance from every 'A' character to its closest 'r' and 'c'.
+    a_locations = letter_locations["A"]
+    closest_r, _ = spatial.cKDTree(letter_locations["r"]).query(a_locations)
+    closest_c, _ = spatial.cKDTree(letter_locations["c"]).query(a_locations)
+    # Any 'A' with an 'r' within 6 and a 'c' within 8 is an Arc.
+    return bool(np.any((closest_r <= 6) & (closest_c <= 8)))
 
-def find_plan_view_box(rectangle_layout, plate) -> pymupdf.Rect:
-    """Find the plan view part of the plate"""
-    # Largest rectangle is probably the plan view.
-    largest_rect = rectangle_layout[0][0]
-
-    for row in rectangle_layout:
-        for rect in row:
-            if rect.get_area() > largest_rect.get_area():
-                largest_rect = rect
 
+def find_plan_view_box(largest_rect, plate) -> pymupdf.Rect:
+    """Find the plan view part of the plate, given its largest rectangle"""
     # Just assert that the rectangle is around the middle of the plate, that's
     # where we expect it to be.
-    assert largest_rect.top_left.y < (plate.rect.height / 2)
-    assert largest_rect.bottom_right.y > (plate.rect.height / 2)
-    assert largest_rect.top_left.x < (plate.rect.width / 2)
-    assert largest_rect.bottom_right.x > (plate.rect.width / 2)
+    page_rect = plate.rect
+    assert largest_rect.top_left.y < (page_rect.height / 2)
+    assert largest_rect.bottom_right.y > (page_rect.height / 2)
+    assert largest_rect.top_left.x < (page_rect.width / 2)
+    assert largest_rect.bottom_right.x > (page_rect.width / 2)
 
     return largest_rect
@@ -8,7 +8,7 @@ import pytest
 import plate_analyzer
 
 
-TEST_DATA_DIR = Path(__file__).parent / ".." / "test_data"
+TEST_DATA_DIR = Path(__file__).resolve().parent.parent / "test_data"
 TEST_PLATE = TEST_DATA_DIR / "05035R7.pdf"
 ATHENS_TEST_PLATE = TEST_DATA_DIR / "00983ILD27.pdf"
 MARIN_STATE_TEST_PLATE = TEST_DATA_DIR / "05222VT15.pdf"
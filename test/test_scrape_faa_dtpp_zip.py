@@ -113,7 +113,7 @@ def test_approach_types_handles_vor_suffix():
 # not present.
 import xml.etree.ElementTree as ET
 
-TEST_DATA_DIR = Path(__file__).parent / ".." / "test_data"
+TEST_DATA_DIR = Path(__file__).resolve().parent.parent / "test_data"
 METADATA_FILE = TEST_DATA_DIR / "d-tpp_Metafile.xml"
 
 
@@ -122,14 +122,16 @@ METADATA_FILE = TEST_DATA_DIR / "d-tpp_Metafile.xml"
     reason="Needs d-tpp_Metafile.xml file in test_data folder",
 )
 def test_resolve_approach_types():
-    with METADATA_FILE.open() as f:
-        metadata = ET.fromstring(f.read())
-
-    for record in metadata.iter("record"):
+    # Stream the records rather than building the whole document in memory.
+    for _, record in ET.iterparse(METADATA_FILE, events=("end",)):
+        if record.tag != "record":
+            continue
         chart_code = record.find("chart_code").text
+        chart_name = record.find("chart_name").text
+        # Free up the record's children now that we're done with them.
+        record.clear()
         if chart_code != "IAP":
             continue
-        chart_name = record.find("chart_name").text
         if ("VISUAL" in chart_name) or ("COPTER" in chart_name):
             continue
         # Ignore continuation pages and "Attention All Users" pages
@@ -0,0 +1,53 @@
+from plate_analyzer.segmentation import rasterize_lines
+
+import pymupdf
+import numpy as np
+
+
+def render_lines_with_mupdf(lines, width, height):
+    # Draw the lines the way segmentation used to, into a grayscale pixmap,
+    # and return which pixels the lines touched.
+    document = pymupdf.Document()
+    page = document.new_page(width=width, height=height)
+    shape = page.new_shape()
+    for x0, y0, x1, y1 in lines:
+        shape.draw_line((x0, y0), (x1, y1))
+        shape.finish(color=(0, 0, 0))
+    shape.commit()
+    pixmap = page.get_pixmap(colorspace=pymupdf.csGRAY)
+    image = np.asarray(pixmap.samples_mv).reshape((pixmap.h, pixmap.w))
+    return image != 255
+
+
+def test_rasterize_lines_matches_mupdf_render():
+    lines = np.array(
+        [
+            # Horizontal and vertical lines inside the page.
+            (5, 10, 30, 10),
+            (20, 3, 20, 35),
+            # Lines along the page edges.
+            (0, 0, 40, 0),
+            (0, 0, 0, 30),
+            # Lines that start off the page.
+            (-3, 25, 15, 25),
+            (8, -4, 8, 12),
+            # Line entirely off the page.
+            (-10, -5, -2, -5),
+        ]
+    )
+
+    image = rasterize_lines(lines, 40, 40)
+
+    expected = render_lines_with_mupdf(lines.tolist(), 40, 40)
+    assert np.array_equal(image == 0, expected)
+
+
+def test_rasterize_lines_clips_lines_starting_off_page():
+    # A line starting off the page should still be drawn up to its end,
+    # rather than the negative start wrapping around the image.
+    image = rasterize_lines(np.array([(10, -2, 10, 20)]), 30, 30)
+
+    assert (image[0:20, 9:11] == 0).all()
+    assert (image[20:, :] == 1).all()
+    assert (image[:, :9] == 1).all()
+    assert (image[:, 11:] == 1).all()
@@ -0,0 +1,42 @@
+from plate_analyzer.text_extraction import PlateText
+from plate_analyzer import segmentation
+
+from pathlib import Path
+
+import pymupdf
+
+
+TEST_DATA_DIR = Path(__file__).resolve().parent.parent / "test_data"
+# Portland has the most segmented rectangles of the test plates.
+PORTLAND_TEST_PLATE = TEST_DATA_DIR / "00330IL10R.pdf"
+
+
+def test_plate_text_matches_get_textbox_for_segmented_rectangles():
+    plate = pymupdf.open(PORTLAND_TEST_PLATE)[0]
+    textpage = plate.get_textpage()
+    rectangles = segmentation.segment_plate_into_rectangles(plate, plate.get_drawings())
+
+    # Without pre-computing the rectangles, every lookup takes the uncached
+    # path.
+    plate_text = PlateText(textpage)
+    indexed_plate_text = PlateText(textpage)
+    indexed_plate_text.index_rectangles(rectangles)
+
+    for rect in rectangles:
+        expected = plate.get_textbox(rect, textpage=textpage)
+        assert plate_text.textbox(rect) == expected, rect
+        assert indexed_plate_text.textbox(rect) == expected, rect
+
+
+def test_plate_text_skips_characters_outside_the_page():
+    document = pymupdf.Document()
+    page = document.new_page(width=200, height=200)
+    page.insert_text((-30, 50), "OFFPAGE")
+    page.insert_text((20, 100), "ONPAGE")
+    textpage = page.get_textpage()
+
+    rect = pymupdf.Rect(-100, 0, 200, 200)
+    # get_textbox still returns the characters that are off the page, the
+    # rawdict extraction does not.
+    assert page.get_textbox(rect, textpage=textpage) == "OFFPAGE\nONPAGE"
+    assert PlateText(textpage).textbox(rect) == "AGE\nONPAGE"